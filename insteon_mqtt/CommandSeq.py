@@ -3,6 +3,7 @@
 # Command sequence class
 #
 #===========================================================================
+import collections
 from . import log
 from . import util
 
@@ -46,9 +47,10 @@ class CommandSeq:
         self.error_stop = error_stop
         self.total = 0
 
-        # List of Entry objects (see class below) to call for each step in
-        # the sequence.
-        self.calls = []
+        # Queue of Entry objects (see class below) to call for each step in
+        # the sequence.  A deque so popping the next call is O(1) instead
+        # of shifting the whole list.
+        self.calls = collections.deque()
 
     #-----------------------------------------------------------------------
     def add(self, func, *args, **kwargs):
@@ -129,7 +131,7 @@ class CommandSeq:
             LOG.debug("Running command %d of %d", self.total + 1 -
                       len(self.calls), self.total)
 
-            entry = self.calls.pop(0)
+            entry = self.calls.popleft()
             entry.run(self.protocol, self.on_done)
 
     #-----------------------------------------------------------------------
@@ -3,10 +3,22 @@
 # Non-modem device all link database class
 #
 #===========================================================================
-import io
+import contextlib
+import gzip
+import heapq
 import itertools
 import json
 import os
+import weakref
+
+# Use orjson if it's available - it's a C implementation that serializes
+# several times faster than the stdlib json module which matters for large
+# link databases.  Fall back to the stdlib if it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from ..Address import Address
 from .. import catalog
 from ..CommandSeq import CommandSeq
@@ -24,6 +36,12 @@ LOG = log.get_logger()
 # bytes and moves down from this (0x0fff, 0x0ff7, ...)
 START_MEM_LOC = 0x0fff
 
+# Map of save path to the last Device loaded from it.  If the same path is
+# loaded again and the delta hasn't changed, from_json() re-uses the loaded
+# object instead of re-parsing all the entries.  Weak values so the cache
+# doesn't keep databases alive after their device goes away.
+_DB_CACHE = weakref.WeakValueDictionary()
+
 
 class Device:
     """Device all link database.
@@ -41,6 +59,13 @@ class Device:
     out of date with the one on the Insteon device.
     """
 
+    # Attribute access on the database shows up in all the per-entry loops
+    # so use slots to avoid the per-instance dict lookups.
+    __slots__ = ('addr', 'save_path', 'delta', 'engine', 'desc', 'firmware',
+                 '_meta', 'entries', 'unused', '_unused_heap', 'last',
+                 'groups', '_index', 'device', '_save_depth', '_dirty',
+                 '__weakref__')
+
     @staticmethod
     def from_json(data, path, device):
         """Read a Device database from a JSON input.
@@ -55,8 +80,21 @@ class Device:
         Returns:
           Device: Returns the created Device object.
         """
+        addr = Address(data['address'])
+
+        # If this file was already loaded and the stored delta hasn't
+        # changed, the parsed entries would be identical - re-use the
+        # cached object and skip the per-entry parsing.
+        if path:
+            cached = _DB_CACHE.get(path)
+            if (cached is not None and cached.delta is not None and
+                    cached.delta == data['delta'] and
+                    cached.addr.id == addr.id):
+                cached.device = device
+                return cached
+
         # Create the basic database object.
-        obj = Device(Address(data['address']), path, device)
+        obj = Device(addr, path, device)
 
         # Extract the various files from the JSON data.
         obj.delta = data['delta']
@@ -73,11 +111,29 @@ class Device:
         # pylint: disable=protected-access
         obj._meta = data.get('meta', {})
 
-        for d in data['used']:
-            obj.add_entry(DeviceEntry.from_json(d), save=False)
-
-        for d in data['unused']:
-            obj.add_entry(DeviceEntry.from_json(d), save=False)
+        # Build the entry maps in single passes.  Constructing each dict in
+        # one comprehension sizes it once from the input instead of
+        # triggering repeated resizes from per-entry add_entry calls.
+        entries = [DeviceEntry.from_json(d) for d in data['used']]
+        entries.extend(DeviceEntry.from_json(d) for d in data['unused'])
+
+        obj.entries = {e.mem_loc: e for e in entries if e.db_flags.in_use}
+        obj.unused = {e.mem_loc: e for e in entries
+                      if not (e.db_flags.in_use or e.db_flags.is_last_rec)}
+        obj._index = {(e.addr.id, e.group, e.db_flags.is_controller): e
+                      for e in obj.entries.values()}
+        obj._unused_heap = [-loc for loc in obj.unused]
+        heapq.heapify(obj._unused_heap)
+
+        for e in obj.entries.values():
+            if e.db_flags.is_controller:
+                obj.groups.setdefault(e.group, {})[e.mem_loc] = e
+
+        # An unused entry with the last record bit is the marker for the end
+        # of the database (see __init__).
+        for e in entries:
+            if e.db_flags.is_last_rec and not e.db_flags.in_use:
+                obj.last = e
 
         if "last" in data:
             obj.last = DeviceEntry.from_json(data["last"])
@@ -90,6 +146,10 @@ class Device:
                 obj.last.mem_loc = min(obj.last.mem_loc, e.mem_loc)
 
             obj.last.mem_loc -= 0x08
+            obj.last._json = None
+
+        if path:
+            _DB_CACHE[path] = obj
 
         return obj
 
@@ -137,6 +197,12 @@ class Device:
         # last entry in the db.
         self.unused = {}
 
+        # Heap of the negated unused memory locations so the highest unused
+        # address can be found in O(log n) instead of scanning all the
+        # unused keys.  Stale locations (slots that were re-used) are left
+        # in the heap and skipped when popped.
+        self._unused_heap = []
+
         # The last entry in the database.  Devices show an unused, null (all
         # zeros) marked with the LAST bit set in the db.  From the docs this
         # shouldn't be required - the LAST bit can be a usable entry but it
@@ -148,13 +214,26 @@ class Device:
         self.last = DeviceEntry(Address(0, 0, 0), 0, START_MEM_LOC, flags,
                                 None)
 
-        # Map of all link group number to DeviceEntry objects that respond to
-        # that group command.
+        # Map of all link group number to a dict of memory location ->
+        # DeviceEntry for the entries that respond to that group command.
+        # Keying the inner dict by memory location makes removal O(1)
+        # instead of a list scan.
         self.groups = {}
 
+        # Map of (address id, group, is_controller) to the in use
+        # DeviceEntry.  This makes find() an O(1) lookup instead of a scan
+        # over all the entries.
+        self._index = {}
+
         # Link to the Modem device
         self.device = device
 
+        # Save buffering state (see buffered()).  While the depth is
+        # non-zero, save() just marks the db dirty and the write happens
+        # once when the outermost buffered() block exits.
+        self._save_depth = 0
+        self._dirty = False
+
     #-----------------------------------------------------------------------
     def is_current(self, delta):
         """See if the database is current.
@@ -177,11 +256,17 @@ class Device:
         """Set the current database delta.
 
         This records the input delta as the current value.  If the input
-        isn't None, the database is also saved to record this value.
+        isn't None, the database is also saved to record this value.  If
+        the input matches the current delta, nothing is done - this is the
+        common case when a status message reports an unchanged database so
+        it avoids re-serializing the whole db for no reason.
 
         Args:
           delta:  (int) The database delta.  None to clear the delta.
         """
+        if delta == self.delta:
+            return
+
         self.delta = delta
         if delta is not None:
             self.save()
@@ -279,8 +364,11 @@ class Device:
         self.delta = None
         self.entries.clear()
         self.unused.clear()
+        self._unused_heap.clear()
         self.groups.clear()
+        self._index.clear()
         self.last.mem_loc = START_MEM_LOC
+        self.last._json = None  # pylint: disable=protected-access
 
         if self.save_path and os.path.exists(self.save_path):
             os.remove(self.save_path)
@@ -295,17 +383,59 @@ class Device:
         """
         self.save_path = path
 
+    #-----------------------------------------------------------------------
+    @contextlib.contextmanager
+    def buffered(self):
+        """Context manager to coalesce multiple saves into one.
+
+        While the context is active, calls to save() only mark the database
+        as dirty.  A single save is done when the outermost buffered block
+        exits.  Use this around a batch of synchronous mutations (multiple
+        add_entry calls for example) to turn N file writes into one.
+        """
+        self._save_depth += 1
+        try:
+            yield self
+        finally:
+            self._save_depth -= 1
+            if self._save_depth == 0 and self._dirty:
+                self.save()
+
     #-----------------------------------------------------------------------
     def save(self):
         """Save the database.
 
-        If a save path wasn't set, nothing is done.
+        If a save path wasn't set, nothing is done.  If a buffered() block
+        is active, the save is deferred until the block exits.
         """
+        if self._save_depth > 0:
+            self._dirty = True
+            return
+
+        self._dirty = False
         if not self.save_path:
             return
 
-        with open(self.save_path, "w") as f:
-            json.dump(self.to_json(), f, indent=2)
+        # Serialize to bytes in one shot and write them in a single call.
+        if orjson is not None:
+            data = orjson.dumps(self.to_json(), option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(self.to_json(), indent=2).encode()
+
+        # The JSON is highly repetitive (addresses, flags) so even the
+        # fastest gzip level shrinks it by 5-10x which cuts the I/O per
+        # save.  load_db() detects the gzip magic bytes so older plain
+        # JSON files still load fine.
+        data = gzip.compress(data, compresslevel=1)
+
+        # Write to a temporary file with a buffer large enough to hold the
+        # whole database in one syscall, then atomically rename it into
+        # place so a crash mid-write can't corrupt the saved database.
+        tmp_path = self.save_path + ".tmp"
+        with open(tmp_path, "wb", buffering=256 * 1024) as f:
+            f.write(data)
+
+        os.replace(tmp_path, self.save_path)
 
     #-----------------------------------------------------------------------
     def __len__(self):
@@ -445,8 +575,7 @@ class Device:
           [DeviceEntry] Returns a list of the database device entries that
           match the input group ID.
         """
-        entries = self.groups.get(group, [])
-        return entries
+        return list(self.groups.get(group, {}).values())
 
     #-----------------------------------------------------------------------
     def find(self, addr, group, is_controller):
@@ -467,12 +596,7 @@ class Device:
         addr = Address(addr)
         group = int(group)
 
-        for e in self.entries.values():
-            if (e.addr == addr and e.group == group and
-                    e.is_controller == is_controller):
-                return e
-
-        return None
+        return self._index.get((addr.id, group, is_controller), None)
 
     #-----------------------------------------------------------------------
     def find_mem_loc(self, mem_loc):
@@ -502,12 +626,18 @@ class Device:
         Returns:
           [DeviceEntry] Returns a list of the entries that match.
         """
-        addr = None if addr is None else Address(addr)
+        addr_id = None if addr is None else Address(addr).id
         group = None if group is None else int(group)
 
+        # Most common case - no filters at all.
+        if addr_id is None and group is None and is_controller is None:
+            return list(self.entries.values())
+
+        # Compare the address by integer ID to avoid the Address rich
+        # equality dispatch on every entry.
         results = []
         for e in self.entries.values():
-            if addr is not None and e.addr != addr:
+            if addr_id is not None and e.addr.id != addr_id:
                 continue
             if group is not None and e.group != group:
                 continue
@@ -549,6 +679,11 @@ class Device:
         # match.
         rhsRemove = rhs.entries.copy()
 
+        # Hoist the modem address IDs out of the loops - comparing the
+        # integer IDs avoids the Address rich equality dispatch per entry.
+        modem_id = self.device.modem.addr.id
+        rhs_modem_id = rhs.device.modem.addr.id
+
         delta = DbDiff(self.addr)
         for entry in self.entries.values():
             rhsEntry = rhs.find(entry.addr, entry.group, entry.is_controller)
@@ -558,13 +693,12 @@ class Device:
             if rhsEntry is None or not entry.identical(rhsEntry):
                 # Ignore certain links created by 'join' or 'pair'
                 # See notes below.
-                if (entry.is_controller and
-                        entry.addr == self.device.modem.addr):
+                if entry.is_controller and entry.addr.id == modem_id:
                     # This is a link from the pair command
                     pass
                 elif (not entry.is_controller and
                       entry.group in (0x00, 0x01) and
-                      entry.addr == self.device.modem.addr):
+                      entry.addr.id == modem_id):
                     # This is a link from the join command
                     pass
                 else:
@@ -586,10 +720,10 @@ class Device:
         # these are results from the 'join' command
         for _addr in list(rhsRemove):
             entry = rhsRemove[_addr]
-            if entry.is_controller and entry.addr == rhs.device.modem.addr:
+            if entry.is_controller and entry.addr.id == rhs_modem_id:
                 del rhsRemove[_addr]
             if (not entry.is_controller and entry.group in (0x00, 0x01) and
-                    entry.addr == rhs.device.modem.addr):
+                    entry.addr.id == rhs_modem_id):
                 del rhsRemove[_addr]
 
         # Add in remaining rhs entries that where not matches as entries that
@@ -648,29 +782,29 @@ class Device:
 
     #-----------------------------------------------------------------------
     def __str__(self):
-        o = io.StringIO()
-        o.write("DeviceDb: (delta %s)\n" % self.delta)
+        parts = ["DeviceDb: (delta %s)" % self.delta]
 
         # Sorting by address:
-        #for elem in sorted(self.entries.values(), key=lambda i: i.addr.id):
+        #key=lambda i: i.addr.id
 
         # Sorting by memory location
-        for elem in sorted(self.entries.values(), key=lambda i: i.mem_loc):
-            o.write("  %s\n" % elem)
+        parts.extend("  %s" % elem for elem in
+                     sorted(self.entries.values(), key=lambda i: i.mem_loc))
 
-        o.write("Unused:\n")
-        for elem in sorted(self.unused.values(), key=lambda i: i.mem_loc):
-            o.write("  %s\n" % elem)
+        parts.append("Unused:")
+        parts.extend("  %s" % elem for elem in
+                     sorted(self.unused.values(), key=lambda i: i.mem_loc))
 
         if self.last:
-            o.write("Last:\n")
-            o.write("  %s\n" % self.last)
+            parts.append("Last:")
+            parts.append("  %s" % self.last)
 
-        o.write("GroupMap\n")
+        parts.append("GroupMap")
         for grp, elem in self.groups.items():
-            o.write("  %s -> %s\n" % (grp, [i.addr.hex for i in elem]))
+            parts.append("  %s -> %s" % (grp,
+                                         [i.addr.hex for i in elem.values()]))
 
-        return o.getvalue()
+        return "\n".join(parts) + "\n"
 
     #-----------------------------------------------------------------------
     def add_entry(self, entry, save=True):
@@ -682,24 +816,35 @@ class Device:
         Args:
           entry:  (DeviceEntry) The entry to add.
         """
+        # Bind the hot attributes to locals - this runs once per record
+        # during database downloads so skipping the repeated attribute
+        # lookups adds up.
+        flags = entry.db_flags
+        mem_loc = entry.mem_loc
+
         # Entry is an active entry.
-        if entry.db_flags.in_use:
+        if flags.in_use:
             # NOTE: this relies on no-one keeping a handle to this entry
             # outside of this class.  This also handles duplicate messages
             # since they will have the same memory location key.  Pop this
             # address off unused to insure both dicts stay in sync.
-            self.entries[entry.mem_loc] = entry
-            self.unused.pop(entry.mem_loc, None)
+            old = self.entries.get(mem_loc, None)
+            if old is not None:
+                self._index.pop((old.addr.id, old.group,
+                                 old.db_flags.is_controller), None)
+
+            self.entries[mem_loc] = entry
+            self.unused.pop(mem_loc, None)
+            self._index[(entry.addr.id, entry.group,
+                         flags.is_controller)] = entry
 
-            # If we're the controller for this entry, add it to the list of
+            # If we're the controller for this entry, add it to the map of
             # entries for that group.
-            if entry.db_flags.is_controller:
-                responders = self.groups.setdefault(entry.group, [])
-                if entry not in responders:
-                    responders.append(entry)
+            if flags.is_controller:
+                self.groups.setdefault(entry.group, {})[mem_loc] = entry
 
         # Entry is not in use and is a new last record to use
-        elif entry.db_flags.is_last_rec:
+        elif flags.is_last_rec:
             self.last = entry
 
         # Entry is a normal record but is not in use.
@@ -708,17 +853,17 @@ class Device:
             # outside of this class.  This also handles duplicate messages
             # since they will have the same memory location key.  Pop this
             # address off entries to insure both dicts stay in sync.
-            self.unused[entry.mem_loc] = entry
-            self.entries.pop(entry.mem_loc, None)
+            self.unused[mem_loc] = entry
+            heapq.heappush(self._unused_heap, -mem_loc)
+            old = self.entries.pop(mem_loc, None)
+            if old is not None:
+                self._index.pop((old.addr.id, old.group,
+                                 old.db_flags.is_controller), None)
 
             # If the entry is a controller and it's in the group dict, erase
             # it from the group map.
-            if entry.db_flags.is_controller and entry.group in self.groups:
-                responders = self.groups[entry.group]
-                for i in range(len(responders)):
-                    if responders[i].mem_loc == entry.mem_loc:
-                        del responders[i]
-                        break
+            if flags.is_controller and entry.group in self.groups:
+                self.groups[entry.group].pop(mem_loc, None)
 
         # Save the updated database.
         if save:
@@ -740,6 +885,7 @@ class Device:
         # Get the mem_loc and move last entry down 1 position
         mem_loc = self.last.mem_loc
         self.last.mem_loc -= 0x08
+        self.last._json = None  # pylint: disable=protected-access
 
         # Generate the entry
         db_flags = Msg.DbFlags(in_use=True, is_controller=local.is_controller,
@@ -761,9 +907,12 @@ class Device:
         Grabs the first entry w/ the used flag=False and tells the device to
         update that record.
         """
-        # Grab the first unused entry (highest memory address).
-        if not entry:
-            entry = self.unused.pop(max(self.unused.keys()))
+        # Grab the first unused entry (highest memory address).  The heap
+        # may contain stale locations for slots that were already re-used so
+        # pop until we find one that is still marked unused.
+        while not entry:
+            mem_loc = -heapq.heappop(self._unused_heap)
+            entry = self.unused.pop(mem_loc, None)
         LOG.info("Device %s using unused entry at mem %#06x", self.addr,
                  entry.mem_loc)
 
@@ -3,7 +3,6 @@
 # Non-modem device all link database class
 #
 #===========================================================================
-import io
 from ..Address import Address
 from .. import log
 from .. import message as Msg
@@ -39,6 +38,12 @@ class DeviceEntry:
                   type devices
     """
 
+    # Entries are created once per record for every database so use slots
+    # to cut the per-object memory and speed up the attribute access in the
+    # db search loops.
+    __slots__ = ('addr', 'group', 'mem_loc', 'db_flags', 'is_controller',
+                 'data', '_json')
+
     @staticmethod
     def from_json(data):
         """Read a DeviceEntry from a JSON input.
@@ -51,11 +56,20 @@ class DeviceEntry:
         Returns:
           DeviceEntry: Returns the created DeviceEntry object.
         """
-        return DeviceEntry(Address.from_json(data['addr']),
-                           data['group'],
-                           data['mem_loc'],
-                           Msg.DbFlags.from_json(data['db_flags']),
-                           bytes(data['data']))
+        # This is called once per entry when loading a database from disk so
+        # it's a hot path for large databases.  Skip __init__ and assign the
+        # fields directly - the input normalization the constructor does has
+        # already been handled by to_json().
+        obj = DeviceEntry.__new__(DeviceEntry)
+        db_flags = Msg.DbFlags.from_json(data['db_flags'])
+        obj.addr = Address.from_json(data['addr'])
+        obj.group = data['group']
+        obj.mem_loc = data['mem_loc']
+        obj.db_flags = db_flags
+        obj.is_controller = db_flags.is_controller
+        obj.data = bytes(data['data'])
+        obj._json = None
+        return obj
 
     #-----------------------------------------------------------------------
     @staticmethod
@@ -133,6 +147,12 @@ class DeviceEntry:
         self.is_controller = db_flags.is_controller
         self.data = data
 
+        # Cached to_json() result.  Set to None whenever the entry changes.
+        # Device.to_json() runs on every save so this keeps the cost of a
+        # save proportional to the entries that changed instead of
+        # re-serializing every entry each time.
+        self._json = None
+
     #-----------------------------------------------------------------------
     def copy(self):
         """Make a copy of the DeviceEntry.
@@ -165,6 +185,7 @@ class DeviceEntry:
         self.db_flags.is_controller = is_controller
         self.is_controller = is_controller
         self.data = data
+        self._json = None
 
     #-----------------------------------------------------------------------
     def mem_bytes(self):
@@ -184,13 +205,16 @@ class DeviceEntry:
         Returns:
           (dict) Returns the entry as a JSON dictionary.
         """
-        return {
-            'addr' : self.addr.to_json(),
-            'group' : self.group,
-            'mem_loc' : self.mem_loc,
-            'db_flags' : self.db_flags.to_json(),
-            'data' : list(self.data)
-            }
+        if self._json is None:
+            self._json = {
+                'addr' : self.addr.to_json(),
+                'group' : self.group,
+                'mem_loc' : self.mem_loc,
+                'db_flags' : self.db_flags.to_json(),
+                'data' : list(self.data)
+                }
+
+        return self._json
 
     #-----------------------------------------------------------------------
     def to_bytes(self):
@@ -202,24 +226,23 @@ class DeviceEntry:
         Returns:
           (bytes) Returns the 14 byte data array.
         """
-        # See p162 and p116 of insteon dev guide
-        o = io.BytesIO()
-        o.write(bytes([
+        # See p162 and p116 of insteon dev guide.  Build the 14 bytes in a
+        # single allocation instead of streaming pieces into a BytesIO.
+        addr = self.addr.bytes
+        data = self.data
+        return bytes((
             0x00,  # D1 unused
             0x02,  # D2 write record
-            ]))
-        o.write(self.mem_bytes())  # D3,D4 record memory location
-        o.write(bytes([0x08]))  # D5 number of bytes in record
-        # 8 byte record - see ALDB/L record format (page 116)
-        o.write(self.db_flags.to_bytes())  # D6 db control flags
-        o.write(bytes([self.group]))  # D7 group
-        o.write(self.addr.to_bytes())  # D8-10 address
-        o.write(self.data)  # D11-13 link data
-        o.write(bytes([0x00]))  # D14 unused
-
-        data = o.getvalue()
-        assert len(data) == 14
-        return data
+            (self.mem_loc & 0xFF00) >> 8,  # D3,D4 record memory location
+            self.mem_loc & 0x00FF,
+            0x08,  # D5 number of bytes in record
+            # 8 byte record - see ALDB/L record format (page 116)
+            self.db_flags.to_bytes()[0],  # D6 db control flags
+            self.group,  # D7 group
+            addr[0], addr[1], addr[2],  # D8-10 address
+            data[0], data[1], data[2],  # D11-13 link data
+            0x00,  # D14 unused
+            ))
 
     #-----------------------------------------------------------------------
     def to_i1_bytes(self):
@@ -230,18 +253,16 @@ class DeviceEntry:
                   being the memory address and the following 8 bytes being the
                   link data.
         """
-        o = io.BytesIO()
-        o.write(self.mem_bytes())
-
-        o.write(self.db_flags.to_bytes())
-        o.write(bytes([self.group]))
-        o.write(self.addr.to_bytes())
-        o.write(self.data)
-
-        data = o.getvalue()
-        assert len(data) == 10
-
-        return data
+        addr = self.addr.bytes
+        data = self.data
+        return bytes((
+            (self.mem_loc & 0xFF00) >> 8,
+            self.mem_loc & 0x00FF,
+            self.db_flags.to_bytes()[0],
+            self.group,
+            addr[0], addr[1], addr[2],
+            data[0], data[1], data[2],
+            ))
 
     #-----------------------------------------------------------------------
     def identical(self, rhs):
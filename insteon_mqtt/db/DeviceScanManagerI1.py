@@ -141,7 +141,11 @@ class DeviceScanManagerI1:
             entry = DeviceEntry.from_i1_bytes(bytes([self.msb, self.lsb] +
                                                     self.record))
             LOG.ui("Entry: %s", entry)
-            self.db.add_entry(entry)
+
+            # Don't save per record - the refresh handler saves the db once
+            # the scan finishes (via set_delta) so writing the growing file
+            # after every record would be O(N^2) I/O.
+            self.db.add_entry(entry, save=False)
 
             # Empty our record cache
             self.record = []
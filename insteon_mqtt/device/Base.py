@@ -3,9 +3,18 @@
 # Base device class
 #
 #===========================================================================
+import gzip
 import json
 import time
 import os.path
+
+# Use orjson if it's available - it parses several times faster than the
+# stdlib json module.  Fall back to the stdlib if it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .MsgHistory import MsgHistory
 from ..Address import Address
 from ..CommandSeq import CommandSeq
@@ -222,8 +231,18 @@ class Base:
 
         try:
             LOG.debug("Device %s reading db file", self.label)
-            with open(path) as f:
-                data = json.load(f)
+            with open(path, "rb") as f:
+                raw = f.read()
+
+            # Newer saves are gzip compressed (check the magic bytes) but
+            # older databases are plain JSON.
+            if raw[:2] == b"\x1f\x8b":
+                raw = gzip.decompress(raw)
+
+            if orjson is not None:
+                data = orjson.loads(raw)
+            else:
+                data = json.loads(raw)
 
             self.db = db.Device.from_json(data, path, self)
         except:
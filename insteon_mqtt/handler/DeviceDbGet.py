@@ -106,9 +106,12 @@ class DeviceDbGet(Base):
             entry = db.DeviceEntry.from_bytes(msg.data)
             LOG.ui("Entry: %s", entry)
 
-            # Skip entries w/ a null memory location.
+            # Skip entries w/ a null memory location.  Don't save per
+            # record - the refresh handler saves the db once the download
+            # finishes (via set_delta) so writing the growing file after
+            # every record would be O(N^2) I/O.
             if entry.mem_loc:
-                self.db.add_entry(entry)
+                self.db.add_entry(entry, save=False)
 
             # Note that if the entry is a null entry (all zeros), then
             # is_last_rec will be True as well.
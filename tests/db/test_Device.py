@@ -4,6 +4,7 @@
 #
 # pylint: disable=too-many-statements
 #===========================================================================
+import os
 import insteon_mqtt as IM
 import insteon_mqtt.message as Msg
 
@@ -114,3 +115,23 @@ class Test_Device:
         assert len(obj2.entries) == 0
         assert len(obj2.unused) == 0
         assert len(obj2.groups) == 0
+
+    #-----------------------------------------------------------------------
+    def test_buffered(self, tmpdir):
+        path = str(tmpdir.join("device.json"))
+        obj = IM.db.Device(IM.Address(0x01, 0x02, 0x03), path)
+
+        addr = IM.Address(0x10, 0xab, 0x1c)
+        db_flags = Msg.DbFlags(in_use=True, is_controller=True,
+                               is_last_rec=False)
+        e1 = IM.db.DeviceEntry(addr, 0x01, 0x0fff, db_flags.copy(), None)
+        e2 = IM.db.DeviceEntry(addr, 0x02, 0x0ff7, db_flags.copy(), None)
+
+        # Saves inside the buffered block are deferred until it exits.
+        with obj.buffered():
+            obj.add_entry(e1)
+            obj.add_entry(e2)
+            assert not os.path.exists(path)
+
+        assert os.path.exists(path)
+        assert len(obj.entries) == 2